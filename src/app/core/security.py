@@ -1,28 +1,72 @@
+import base64
+import binascii
+import hashlib
+import hmac
 import secrets
+import time
 from typing import Optional
 
-from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+SIGNATURE_BYTES = 16
 
 
-def build_serializer(secret_key: str) -> URLSafeTimedSerializer:
-    return URLSafeTimedSerializer(secret_key, salt="email-verification")
+def _b64encode(value: bytes) -> str:
+    return base64.urlsafe_b64encode(value).rstrip(b"=").decode("ascii")
 
 
-def generate_verification_token(serializer: URLSafeTimedSerializer, email: str) -> str:
-    payload = {
-        "email": email,
-        "nonce": secrets.token_urlsafe(16),
-    }
-    return serializer.dumps(payload)
+def _b64decode(value: str) -> bytes:
+    return base64.urlsafe_b64decode(value + "=" * (-len(value) % 4))
+
+
+class TokenSigner:
+    def __init__(self, secret_key: str, salt: str) -> None:
+        self._key = hashlib.sha256(f"{salt}:{secret_key}".encode("utf-8")).digest()
+
+    def _signature(self, value: str) -> str:
+        digest = hmac.new(self._key, value.encode("ascii"), hashlib.sha256).digest()
+        return _b64encode(digest[:SIGNATURE_BYTES])
+
+    def sign(self, payload: bytes) -> str:
+        timestamp = int(time.time()).to_bytes(8, "big")
+        value = f"{_b64encode(payload)}.{_b64encode(timestamp)}"
+        return f"{value}.{self._signature(value)}"
+
+    def verify(self, token: str, max_age_seconds: int) -> Optional[bytes]:
+        if not token.isascii():
+            return None
+        value, _, signature = token.rpartition(".")
+        if not value or not hmac.compare_digest(signature, self._signature(value)):
+            return None
+        encoded_payload, _, encoded_timestamp = value.partition(".")
+        try:
+            payload = _b64decode(encoded_payload)
+            timestamp = int.from_bytes(_b64decode(encoded_timestamp), "big")
+        except (binascii.Error, ValueError):
+            return None
+        age = time.time() - timestamp
+        if age < 0 or age > max_age_seconds:
+            return None
+        return payload
+
+
+def build_serializer(secret_key: str) -> TokenSigner:
+    return TokenSigner(secret_key, salt="email-verification")
+
+
+def generate_verification_token(serializer: TokenSigner, email: str) -> str:
+    payload = f"{email}:{secrets.token_urlsafe(16)}"
+    return serializer.sign(payload.encode("utf-8"))
 
 
 def verify_token(
-    serializer: URLSafeTimedSerializer,
+    serializer: TokenSigner,
     token: str,
     max_age_seconds: int,
 ) -> Optional[str]:
+    payload = serializer.verify(token, max_age_seconds)
+    if payload is None:
+        return None
     try:
-        data = serializer.loads(token, max_age=max_age_seconds)
-    except (SignatureExpired, BadSignature):
+        email, _, _nonce = payload.decode("utf-8").rpartition(":")
+    except UnicodeDecodeError:
         return None
-    return data.get("email")
+    return email or None
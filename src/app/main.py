@@ -1,22 +1,30 @@
 import os
 import re
+import secrets
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 
 from dotenv import load_dotenv
 from fastapi import FastAPI, File, Form, HTTPException, Request, UploadFile
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, ORJSONResponse, RedirectResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from jinja2 import FileSystemBytecodeCache
 from loguru import logger
 from markdown_it import MarkdownIt
+from starlette.background import BackgroundTask
 from starlette.middleware.sessions import SessionMiddleware
 
 from app.core.config import load_config
 from app.core.logging import configure_logging
 from app.core.security import build_serializer, generate_verification_token, verify_token
-from app.services.email_service import send_verification_email
+from app.services.email_service import EmailService
+from app.services.fallback_index import FallbackIndex
 from app.services.index_store import IndexStore
 from app.services.openai_client import OpenAIService
 from app.services.search_service import SearchResult, SearchService
@@ -35,7 +43,7 @@ if not config.secret_key:
     logger.error("Missing required environment variable: SECRET_KEY")
     raise SystemExit(1)
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 app.add_middleware(
     SessionMiddleware,
     secret_key=config.secret_key,
@@ -45,12 +53,26 @@ app.add_middleware(
 )
 
 templates = Jinja2Templates(directory="src/app/templates")
+templates.env.bytecode_cache = FileSystemBytecodeCache()
+for template_name in ("home.html", "viewer.html", "login.html", "manage.html"):
+    templates.env.get_template(template_name)
 app.mount("/static", StaticFiles(directory="src/app/static"), name="static")
 
 markdown = MarkdownIt("commonmark", {"html": True, "linkify": True})
 
 store = IndexStore(config.path_project_resources)
 store.ensure_directories()
+fallback_index = FallbackIndex(store.markdown_dir)
+
+try:
+    PROMPT_TEMPLATE = (store.prompts_dir / "summarize_markdown.md").read_text(encoding="utf-8")
+except FileNotFoundError:
+    logger.warning("Prompt template not found; using fallback prompt")
+    PROMPT_TEMPLATE = (
+        "Summarize the markdown and return JSON with keys title and description. "
+        "Use a concise title and a 1-3 sentence description with an animated tone and "
+        "emojis where appropriate.\nMarkdown:\n{markdown_file_content}"
+    )
 
 openai_service = OpenAIService(config.openai_api_key)
 search_service = SearchService(
@@ -59,9 +81,27 @@ search_service = SearchService(
     username=config.elasticsearch_username,
     password=config.elasticsearch_password,
 )
+email_service = EmailService(
+    smtp_host=config.gmail_smtp_host,
+    smtp_port=config.gmail_smtp_port,
+    smtp_user=config.gmail_smtp_user,
+    smtp_password=config.gmail_smtp_app_password,
+)
 serializer = build_serializer(config.secret_key)
+# Login attempts whose background email send failed, keyed by the attempt id
+# stored in the requester's session. Held per worker process and capped, since
+# clients that never follow the redirect never consume their entry.
+FAILED_LOGIN_ATTEMPTS_MAX = 32
+failed_login_attempts: "OrderedDict[str, bool]" = OrderedDict()
+failed_login_attempts_lock = threading.Lock()
 
 TOKEN_TTL_MINUTES = int(os.getenv("TOKEN_TTL_MINUTES", "15"))
+TOKEN_TTL_SECONDS = TOKEN_TTL_MINUTES * 60
+ADMIN_EMAIL_LOWER = config.email_admin_user.lower()
+METADATA_WORKERS = 8
+FILE_READ_WORKERS = 8
+PROMPT_CONTENT_LIMIT = 8192
+_PHRASE_RE = re.compile(r"\"([^\"]+)\"")
 
 
 def _is_authenticated(request: Request) -> bool:
@@ -76,47 +116,114 @@ def _pop_flash(request: Request, key: str) -> Any:
     return request.session.pop(key, None)
 
 
+@lru_cache(maxsize=256)
+def _render_cached(path_str: str, mtime_ns: int, size: int) -> str:
+    content = Path(path_str).read_text(encoding="utf-8", errors="ignore")
+    return markdown.render(content)
+
+
+def _send_login_email(email: str, verify_url: str, attempt: str) -> None:
+    if not email_service.send_verification_email(email, verify_url):
+        with failed_login_attempts_lock:
+            failed_login_attempts[attempt] = True
+            while len(failed_login_attempts) > FAILED_LOGIN_ATTEMPTS_MAX:
+                failed_login_attempts.popitem(last=False)
+
+
+def _warm_render_cache(filename: str) -> None:
+    path = store.markdown_dir_resolved / filename
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        return
+    _render_cached(str(path), stat.st_mtime_ns, stat.st_size)
+
+
 def _load_prompt(markdown_text: str) -> str:
-    prompt_path = store.prompts_dir / "summarize_markdown.md"
-    if prompt_path.exists():
-        template = prompt_path.read_text(encoding="utf-8")
-    else:
-        logger.warning("Prompt template not found; using fallback prompt")
-        template = (
-            "Summarize the markdown and return JSON with keys title and description. "
-            "Use a concise title and a 1-3 sentence description with an animated tone and "
-            "emojis where appropriate.\nMarkdown:\n{markdown_file_content}"
-        )
-    return template.replace("{markdown_file_content}", markdown_text)
+    return PROMPT_TEMPLATE.replace("{markdown_file_content}", markdown_text)
 
 
-def _index_markdown_files(filenames: List[str]) -> None:
+def _read_markdown(filename: str) -> Optional[str]:
+    try:
+        return (store.markdown_dir / filename).read_text(encoding="utf-8", errors="ignore")
+    except FileNotFoundError:
+        return None
+
+
+def _map_reads(read: Callable[[str], Optional[str]], filenames: List[str]) -> List[Optional[str]]:
+    if len(filenames) <= 1:
+        return [read(filename) for filename in filenames]
+    # File reads release the GIL, so overlapping them hides per-file latency.
+    with ThreadPoolExecutor(max_workers=FILE_READ_WORKERS) as executor:
+        return list(executor.map(read, filenames))
+
+
+def _read_markdown_contents(filenames: List[str]) -> Dict[str, str]:
+    results = _map_reads(_read_markdown, filenames)
+    return {
+        filename: content
+        for filename, content in zip(filenames, results)
+        if content is not None
+    }
+
+
+def _index_markdown_files(filenames: List[str], contents: Optional[Dict[str, str]] = None) -> None:
     if not search_service.is_enabled():
         return
     rows = {row.filename: row.is_public for row in store.list_rows()}
+    search_service.bulk_index(_iter_search_documents(filenames, rows, contents or {}))
+
+
+def _iter_search_documents(
+    filenames: List[str],
+    visibility: Dict[str, bool],
+    contents: Dict[str, str],
+) -> Iterator[Tuple[str, str, bool]]:
     for filename in filenames:
-        path = store.markdown_dir / filename
-        if not path.exists():
+        content = contents.get(filename)
+        if content is None:
+            content = _read_markdown(filename)
+        if content is None:
             continue
-        content = path.read_text(encoding="utf-8", errors="ignore")
-        is_public = rows.get(filename, False)
-        search_service.index_document(filename, content, is_public)
+        yield filename, content, visibility.get(filename, False)
+
+
+def _read_prompt_excerpt(filename: str, contents: Dict[str, str]) -> Optional[str]:
+    content = contents.get(filename)
+    if content is None:
+        try:
+            with (store.markdown_dir / filename).open("r", encoding="utf-8", errors="ignore") as handle:
+                content = handle.read(PROMPT_CONTENT_LIMIT + 1)
+        except FileNotFoundError:
+            return None
+    if len(content) > PROMPT_CONTENT_LIMIT:
+        content = content[:PROMPT_CONTENT_LIMIT] + "\n[truncated]"
+    return content
 
 
 def _build_metadata_updates(
     filenames: List[str],
     existing: Dict[str, Dict[str, str]],
+    contents: Optional[Dict[str, str]] = None,
 ) -> Tuple[Dict[str, Dict[str, str]], int]:
     updates: Dict[str, Dict[str, str]] = {}
     errors = 0
-    for filename in filenames:
-        path = store.markdown_dir / filename
-        if not path.exists():
+    jobs: List[Tuple[str, str]] = []
+    contents = contents or {}
+    if all(filename in contents for filename in filenames):
+        excerpts = [_read_prompt_excerpt(filename, contents) for filename in filenames]
+    else:
+        excerpts = _map_reads(lambda name: _read_prompt_excerpt(name, contents), filenames)
+    for filename, content in zip(filenames, excerpts):
+        if content is None:
             errors += 1
             continue
-        content = path.read_text(encoding="utf-8", errors="ignore")
-        prompt = _load_prompt(content)
-        generated = openai_service.generate_metadata(prompt)
+        jobs.append((filename, _load_prompt(content)))
+    results = openai_service.generate_metadata_batch(
+        [prompt for _, prompt in jobs],
+        concurrency=METADATA_WORKERS,
+    )
+    for (filename, _prompt), generated in zip(jobs, results):
         if not generated:
             errors += 1
             continue
@@ -133,6 +240,8 @@ def _build_metadata_updates(
 
 
 def _run_search(query: str, is_authenticated: bool) -> List[SearchResult]:
+    if not query.strip():
+        return []
     public_only = not is_authenticated
     if search_service.is_enabled():
         results = search_service.search(query, public_only=public_only, size=50)
@@ -154,11 +263,11 @@ def _fallback_search(query: str, public_only: bool) -> List[SearchResult]:
     results: List[SearchResult] = []
     window = 25
     for row in rows:
-        path = store.markdown_dir / row.filename
-        if not path.exists():
+        entry = fallback_index.get(row.filename)
+        if entry is None:
             continue
-        content = path.read_text(encoding="utf-8", errors="ignore")
-        matches = _find_matches(content, term)
+        content = entry.content
+        matches = _find_matches(entry.content_lower, term)
         for start in matches:
             end = start + len(term)
             snippet_start = max(start - window, 0)
@@ -172,15 +281,20 @@ def _fallback_search(query: str, public_only: bool) -> List[SearchResult]:
     return results[:100]
 
 
+def _is_unsafe_filename(filename: str) -> bool:
+    if filename in {"", ".", ".."}:
+        return True
+    return os.sep in filename or bool(os.altsep and os.altsep in filename)
+
+
 def _extract_phrase(query: str) -> Optional[str]:
-    match = re.search(r"\"([^\"]+)\"", query)
+    match = _PHRASE_RE.search(query)
     return match.group(1).strip() if match else None
 
 
-def _find_matches(content: str, term: str) -> List[int]:
+def _find_matches(content_lower: str, term: str) -> List[int]:
     if not term:
         return []
-    content_lower = content.lower()
     term_lower = term.lower()
     indexes: List[int] = []
     start = 0
@@ -195,12 +309,11 @@ def _find_matches(content: str, term: str) -> List[int]:
 
 @app.get("/", response_class=HTMLResponse)
 def home(request: Request, q: Optional[str] = None):
+    is_authenticated = _is_authenticated(request)
     query = (q or "").strip()
-    results: List[SearchResult] = []
-    if query:
-        results = _run_search(query, _is_authenticated(request))
+    results = _run_search(query, is_authenticated)
     rows = store.list_rows()
-    if not _is_authenticated(request):
+    if not is_authenticated:
         rows = [row for row in rows if row.is_public]
 
     context = {
@@ -208,7 +321,7 @@ def home(request: Request, q: Optional[str] = None):
         "results": results,
         "rows": rows,
         "query": q or "",
-        "is_authenticated": _is_authenticated(request),
+        "is_authenticated": is_authenticated,
         "page_title": "TheDocs",
     }
     return templates.TemplateResponse("home.html", context)
@@ -223,25 +336,29 @@ def search(request: Request, q: Optional[str] = None):
         "count": len(results),
         "results": [{"snippet": r.snippet, "filename": r.filename} for r in results],
     }
-    return JSONResponse(payload)
+    return ORJSONResponse(payload)
 
 
 @app.get("/markdown/{filename}", response_class=HTMLResponse)
 def view_markdown(request: Request, filename: str):
+    if _is_unsafe_filename(filename):
+        raise HTTPException(status_code=400, detail="Invalid filename")
     row = store.get_row(filename)
     if not row:
         raise HTTPException(status_code=404, detail="File not indexed")
-    if not row.is_public and not _is_authenticated(request):
+    is_authenticated = _is_authenticated(request)
+    if not row.is_public and not is_authenticated:
         raise HTTPException(status_code=403, detail="Private file")
 
-    safe_path = (store.markdown_dir / filename).resolve()
-    if store.markdown_dir.resolve() not in safe_path.parents:
+    safe_path = (store.markdown_dir_resolved / filename).resolve()
+    if safe_path.parent != store.markdown_dir_resolved:
         raise HTTPException(status_code=400, detail="Invalid filename")
-    if not safe_path.exists():
+    try:
+        stat = safe_path.stat()
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="File missing")
 
-    content = safe_path.read_text(encoding="utf-8", errors="ignore")
-    html = markdown.render(content)
+    html = _render_cached(str(safe_path), stat.st_mtime_ns, stat.st_size)
     context = {
         "request": request,
         "filename": row.filename,
@@ -249,7 +366,7 @@ def view_markdown(request: Request, filename: str):
         "description": row.description,
         "content": html,
         "is_public": row.is_public,
-        "is_authenticated": _is_authenticated(request),
+        "is_authenticated": is_authenticated,
         "page_title": row.title or row.filename,
     }
     return templates.TemplateResponse("viewer.html", context)
@@ -257,10 +374,19 @@ def view_markdown(request: Request, filename: str):
 
 @app.get("/login", response_class=HTMLResponse)
 def login_form(request: Request):
+    notice = _pop_flash(request, "notice")
+    error = _pop_flash(request, "error")
+    attempt = request.session.get("login_attempt")
+    with failed_login_attempts_lock:
+        email_failed = failed_login_attempts.pop(attempt, False)
+    if email_failed:
+        request.session.pop("login_attempt", None)
+        notice = None
+        error = "Email failed to send. Check SMTP settings."
     context = {
         "request": request,
-        "notice": _pop_flash(request, "notice"),
-        "error": _pop_flash(request, "error"),
+        "notice": notice,
+        "error": error,
         "is_authenticated": _is_authenticated(request),
         "page_title": "Login",
     }
@@ -270,31 +396,31 @@ def login_form(request: Request):
 @app.post("/login")
 def login(request: Request, email: str = Form(...)):
     email = email.strip().lower()
-    if email != config.email_admin_user.lower():
+    if email != ADMIN_EMAIL_LOWER:
         _flash(request, "error", "Email not authorized for admin access.")
         return RedirectResponse(url="/login", status_code=303)
 
+    if not email_service.is_enabled():
+        logger.error("SMTP configuration missing; cannot send verification email")
+        _flash(request, "error", "Email failed to send. Check SMTP settings.")
+        return RedirectResponse(url="/login", status_code=303)
+
     token = generate_verification_token(serializer, email)
     verify_url = f"{request.url_for('verify_email')}?token={token}"
-    sent = send_verification_email(
-        smtp_host=config.gmail_smtp_host,
-        smtp_port=config.gmail_smtp_port,
-        smtp_user=config.gmail_smtp_user,
-        smtp_password=config.gmail_smtp_app_password,
-        to_email=email,
-        verification_url=verify_url,
+    attempt = secrets.token_urlsafe(8)
+    request.session["login_attempt"] = attempt
+    _flash(request, "notice", "Verification email sent. Check your inbox.")
+    return RedirectResponse(
+        url="/login",
+        status_code=303,
+        background=BackgroundTask(_send_login_email, email, verify_url, attempt),
     )
-    if sent:
-        _flash(request, "notice", "Verification email sent. Check your inbox.")
-    else:
-        _flash(request, "error", "Email failed to send. Check SMTP settings.")
-    return RedirectResponse(url="/login", status_code=303)
 
 
 @app.get("/verify", name="verify_email")
 def verify_email(request: Request, token: str):
-    email = verify_token(serializer, token, TOKEN_TTL_MINUTES * 60)
-    if not email or email.lower() != config.email_admin_user.lower():
+    email = verify_token(serializer, token, TOKEN_TTL_SECONDS)
+    if not email or email.lower() != ADMIN_EMAIL_LOWER:
         _flash(request, "error", "Verification link invalid or expired.")
         return RedirectResponse(url="/login", status_code=303)
 
@@ -321,7 +447,7 @@ def manage(request: Request):
         "notice": _pop_flash(request, "notice"),
         "error": _pop_flash(request, "error"),
         "process_summary": _pop_flash(request, "process_summary"),
-        "is_authenticated": _is_authenticated(request),
+        "is_authenticated": True,
         "page_title": "Manage",
     }
     return templates.TemplateResponse("manage.html", context)
@@ -339,9 +465,8 @@ def upload_file(
         return RedirectResponse(url="/login", status_code=303)
 
     try:
-        content = file.file.read()
         original_name = file.filename or "upload.md"
-        filename = store.save_markdown_file(original_name, content)
+        filename = store.save_markdown_file(original_name, file.file)
     except ValueError:
         _flash(request, "error", "Unsupported file type.")
         return RedirectResponse(url="/manage", status_code=303)
@@ -356,14 +481,21 @@ def upload_file(
     )
     store.upsert_row(row)
 
+    contents = _read_markdown_contents([filename]) if search_service.is_enabled() else {}
     existing = {filename: {"title": row.title, "description": row.description}}
-    updates, _errors = _build_metadata_updates([filename], existing)
+    updates, _errors = _build_metadata_updates([filename], existing, contents)
     store.update_missing_metadata(updates)
 
-    _index_markdown_files([filename])
+    content = contents.get(filename)
+    if content is not None:
+        search_service.index_document(filename, content, public_flag, refresh="wait_for")
 
     _flash(request, "notice", f"Uploaded {filename}.")
-    return RedirectResponse(url="/manage", status_code=303)
+    return RedirectResponse(
+        url="/manage",
+        status_code=303,
+        background=BackgroundTask(_warm_render_cache, filename),
+    )
 
 
 @app.post("/manage/process")
@@ -372,15 +504,19 @@ def process_markdowns(request: Request):
         return RedirectResponse(url="/login", status_code=303)
 
     default_public = False
-    new_files = store.sync_new_files(default_public)
+    files = store.list_markdown_files()
+    new_files = store.sync_new_files(default_public, files)
     rows = store.list_rows()
     existing_rows = {row.filename: {"title": row.title, "description": row.description} for row in rows}
     missing_existing = [row.filename for row in rows if not row.title or not row.description]
     candidates = sorted(set(new_files + missing_existing))
-    updates, errors = _build_metadata_updates(candidates, existing_rows)
+    # Elasticsearch needs the full text of every file, so read candidates once and
+    # share them; without it, metadata prompts only read a bounded excerpt.
+    contents = _read_markdown_contents(candidates) if search_service.is_enabled() else {}
+    updates, errors = _build_metadata_updates(candidates, existing_rows, contents)
     store.update_missing_metadata(updates)
 
-    _index_markdown_files(store.list_markdown_files())
+    _index_markdown_files(files, contents)
 
     total_indexed = len(rows)
     skipped = max(total_indexed - len(new_files) - len(missing_existing), 0)
@@ -399,7 +535,7 @@ def toggle_visibility(request: Request, filename: str = Form(...), is_public: st
     if not _is_authenticated(request):
         return RedirectResponse(url="/login", status_code=303)
     store.toggle_public(filename, is_public == "true")
-    search_service.update_visibility(filename, is_public == "true")
+    search_service.update_visibility(filename, is_public == "true", refresh="wait_for")
     _flash(request, "notice", f"Updated visibility for {filename}.")
     return RedirectResponse(url="/manage", status_code=303)
 
@@ -410,7 +546,8 @@ def delete_file(request: Request, filename: str = Form(...)):
         return RedirectResponse(url="/login", status_code=303)
     store.delete_markdown_file(filename)
     store.delete_row(filename)
-    search_service.delete_document(filename)
+    fallback_index.discard(filename)
+    search_service.delete_document(filename, refresh="wait_for")
     _flash(request, "notice", f"Deleted {filename}.")
     return RedirectResponse(url="/manage", status_code=303)
 
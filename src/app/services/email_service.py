@@ -1,38 +1,95 @@
 import smtplib
+import threading
 from email.message import EmailMessage
 from typing import Optional
 
 from loguru import logger
 
+SMTP_TIMEOUT_SECONDS = 10
 
-def send_verification_email(
-    smtp_host: Optional[str],
-    smtp_port: Optional[int],
-    smtp_user: Optional[str],
-    smtp_password: Optional[str],
-    to_email: str,
-    verification_url: str,
-) -> bool:
-    if not smtp_host or not smtp_port or not smtp_user or not smtp_password:
-        logger.error("SMTP configuration missing; cannot send verification email")
-        return False
-
-    message = EmailMessage()
-    message["Subject"] = "Your TheDocs login link"
-    message["From"] = smtp_user
-    message["To"] = to_email
-    message.set_content(
-        "Use the link below to complete your login:\n\n"
-        f"{verification_url}\n\n"
-        "This link expires shortly. If you did not request it, ignore this email."
-    )
-
-    try:
-        with smtplib.SMTP(smtp_host, smtp_port) as server:
-            server.starttls()
-            server.login(smtp_user, smtp_password)
+
+class EmailService:
+    def __init__(
+        self,
+        smtp_host: Optional[str],
+        smtp_port: Optional[int],
+        smtp_user: Optional[str],
+        smtp_password: Optional[str],
+    ) -> None:
+        self.smtp_host = smtp_host
+        self.smtp_port = smtp_port
+        self.smtp_user = smtp_user
+        self.smtp_password = smtp_password
+        self._server: Optional[smtplib.SMTP] = None
+        self._lock = threading.Lock()
+
+    def is_enabled(self) -> bool:
+        return bool(self.smtp_host and self.smtp_port and self.smtp_user and self.smtp_password)
+
+    def send_verification_email(self, to_email: str, verification_url: str) -> bool:
+        if not self.is_enabled():
+            logger.error("SMTP configuration missing; cannot send verification email")
+            return False
+
+        message = EmailMessage()
+        message["Subject"] = "Your TheDocs login link"
+        message["From"] = self.smtp_user
+        message["To"] = to_email
+        message.set_content(
+            "Use the link below to complete your login:\n\n"
+            f"{verification_url}\n\n"
+            "This link expires shortly. If you did not request it, ignore this email."
+        )
+
+        try:
+            self._send(message)
+            return True
+        except Exception as exc:  # pragma: no cover - network
+            logger.error(f"Failed to send verification email: {exc}")
+            return False
+
+    def _send(self, message: EmailMessage) -> None:
+        # The lock only guards handing the idle session in and out; connecting
+        # and sending happen outside it so a slow server never queues sends.
+        server = self._take_idle()
+        if server is not None:
+            try:
+                server.send_message(message)
+                self._release(server)
+                return
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # The server drops idle sessions; fall through to a fresh one.
+                server.close()
+            except Exception:
+                server.close()
+                raise
+        server = self._connect()
+        try:
             server.send_message(message)
-        return True
-    except Exception as exc:  # pragma: no cover - network
-        logger.error(f"Failed to send verification email: {exc}")
-        return False
+        except Exception:
+            server.close()
+            raise
+        self._release(server)
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.smtp_host, self.smtp_port, timeout=SMTP_TIMEOUT_SECONDS)
+        try:
+            server.starttls()
+            server.login(self.smtp_user, self.smtp_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+
+    def _take_idle(self) -> Optional[smtplib.SMTP]:
+        with self._lock:
+            server, self._server = self._server, None
+        return server
+
+    def _release(self, server: smtplib.SMTP) -> None:
+        with self._lock:
+            if self._server is None:
+                self._server = server
+                return
+        # Another send already parked a session; keep only one open.
+        server.close()
@@ -0,0 +1,40 @@
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+
+@dataclass(frozen=True)
+class FallbackEntry:
+    stamp: Tuple[int, int]
+    content: str
+    content_lower: str
+
+
+class FallbackIndex:
+    def __init__(self, markdown_dir: Path) -> None:
+        self.markdown_dir = markdown_dir
+        self._entries: Dict[str, FallbackEntry] = {}
+
+    def get(self, filename: str) -> Optional[FallbackEntry]:
+        path = self.markdown_dir / filename
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            self.discard(filename)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        entry = self._entries.get(filename)
+        if entry is not None and entry.stamp == stamp:
+            return entry
+        try:
+            content = path.read_text(encoding="utf-8", errors="ignore")
+        except FileNotFoundError:
+            self.discard(filename)
+            return None
+        entry = FallbackEntry(stamp=stamp, content=content, content_lower=content.lower())
+        self._entries[filename] = entry
+        return entry
+
+    def discard(self, filename: str) -> None:
+        self._entries.pop(filename, None)
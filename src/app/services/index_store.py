@@ -1,15 +1,18 @@
 import csv
 import os
 import re
+import shutil
 import tempfile
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import BinaryIO, Dict, List, Optional, Tuple
 
 from filelock import FileLock
 
-ALLOWED_EXTENSIONS = {".md", ".markdown"}
+ALLOWED_EXTENSIONS = frozenset({".md", ".markdown"})
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+_UNSAFE_NAME_RE = re.compile(r"[^A-Za-z0-9_-]+")
 CSV_COLUMNS = ["filename", "title", "description", "is_public", "date_uploaded", "updated_at"]
 
 
@@ -37,7 +40,7 @@ def sanitize_filename(original_name: str) -> str:
     ext = ext.lower()
     if ext not in ALLOWED_EXTENSIONS:
         raise ValueError("Unsupported file extension")
-    name = re.sub(r"[^A-Za-z0-9_-]+", "_", name).strip("_")
+    name = _UNSAFE_NAME_RE.sub("_", name).strip("_")
     if not name:
         name = "document"
     return f"{name}{ext}"
@@ -57,88 +60,86 @@ class IndexStore:
     def __init__(self, base_path: str) -> None:
         self.base_path = Path(base_path)
         self.markdown_dir = self.base_path / "markdown_files"
+        self.markdown_dir_resolved = self.markdown_dir.resolve()
         self.database_dir = self.base_path / "database"
         self.prompts_dir = self.base_path / "prompts"
         self.index_path = self.database_dir / "index.csv"
         self.lock_path = self.database_dir / "index.csv.lock"
+        self._cache: Optional[Tuple[Tuple[int, int, int], Dict[str, IndexRow]]] = None
 
     def ensure_directories(self) -> None:
         self.markdown_dir.mkdir(parents=True, exist_ok=True)
         self.database_dir.mkdir(parents=True, exist_ok=True)
         self.prompts_dir.mkdir(parents=True, exist_ok=True)
-        if not self.index_path.exists():
-            self._write_rows([])
+        self.markdown_dir_resolved = self.markdown_dir.resolve()
+        with FileLock(str(self.lock_path)):
+            if not self.index_path.exists():
+                self._write_rows({})
 
     def list_rows(self) -> List[IndexRow]:
-        with FileLock(str(self.lock_path)):
-            rows = self._read_rows()
-        return rows
+        return list(self._cached_rows().values())
 
     def get_row(self, filename: str) -> Optional[IndexRow]:
-        with FileLock(str(self.lock_path)):
-            rows = self._read_rows()
-        for row in rows:
-            if row.filename == filename:
-                return row
-        return None
+        return self._cached_rows().get(filename)
 
     def upsert_row(self, row: IndexRow) -> None:
         with FileLock(str(self.lock_path)):
             rows = self._read_rows()
-            updated = False
-            for idx, existing in enumerate(rows):
-                if existing.filename == row.filename:
-                    rows[idx] = row
-                    updated = True
-                    break
-            if not updated:
-                rows.append(row)
+            rows[row.filename] = row
             self._write_rows(rows)
 
     def delete_row(self, filename: str) -> None:
         with FileLock(str(self.lock_path)):
-            rows = [row for row in self._read_rows() if row.filename != filename]
+            rows = self._read_rows()
+            if rows.pop(filename, None) is None:
+                return
             self._write_rows(rows)
 
     def toggle_public(self, filename: str, is_public: bool) -> None:
         with FileLock(str(self.lock_path)):
             rows = self._read_rows()
-            for row in rows:
-                if row.filename == filename:
-                    row.is_public = is_public
-                    row.updated_at = _timestamp()
+            row = rows.get(filename)
+            if not row or row.is_public == is_public:
+                return
+            row.is_public = is_public
+            row.updated_at = _timestamp()
             self._write_rows(rows)
 
-    def ensure_unique_filename(self, filename: str) -> str:
-        path = self.markdown_dir / filename
-        if not path.exists():
-            return filename
-        name, ext = os.path.splitext(filename)
-        counter = 1
+    def reserve_filename(self, filename: str) -> str:
+        sanitized = sanitize_filename(filename)
+        name, ext = os.path.splitext(sanitized)
+        candidate = sanitized
+        counter = 0
         while True:
-            candidate = f"{name}-{counter}{ext}"
-            if not (self.markdown_dir / candidate).exists():
+            try:
+                (self.markdown_dir / candidate).touch(exist_ok=False)
                 return candidate
-            counter += 1
+            except FileExistsError:
+                counter += 1
+                candidate = f"{name}-{counter}{ext}"
 
-    def save_markdown_file(self, filename: str, content: bytes) -> str:
-        sanitized = sanitize_filename(filename)
-        unique_name = self.ensure_unique_filename(sanitized)
+    def save_markdown_file(self, filename: str, source: BinaryIO) -> str:
+        unique_name = self.reserve_filename(filename)
         path = self.markdown_dir / unique_name
-        path.write_bytes(content)
+        try:
+            with path.open("wb") as handle:
+                shutil.copyfileobj(source, handle, UPLOAD_CHUNK_SIZE)
+        except Exception:
+            path.unlink(missing_ok=True)
+            raise
         return unique_name
 
     def delete_markdown_file(self, filename: str) -> None:
         path = self.markdown_dir / filename
-        if path.exists():
-            path.unlink()
+        path.unlink(missing_ok=True)
 
     def list_markdown_files(self) -> List[str]:
-        files = []
-        for entry in self.markdown_dir.iterdir():
-            if entry.is_file() and entry.suffix.lower() in ALLOWED_EXTENSIONS:
-                files.append(entry.name)
-        return sorted(files)
+        with os.scandir(self.markdown_dir) as entries:
+            return sorted(
+                entry.name
+                for entry in entries
+                if entry.is_file() and os.path.splitext(entry.name)[1].lower() in ALLOWED_EXTENSIONS
+            )
 
     def build_row(
         self,
@@ -157,21 +158,26 @@ class IndexStore:
             updated_at=_timestamp(),
         )
 
-    def sync_new_files(self, default_public: bool) -> List[str]:
-        files = self.list_markdown_files()
+    def sync_new_files(
+        self,
+        default_public: bool,
+        files: Optional[List[str]] = None,
+    ) -> List[str]:
+        if files is None:
+            files = self.list_markdown_files()
         with FileLock(str(self.lock_path)):
             rows = self._read_rows()
-            existing = {row.filename for row in rows}
-            new_files = [name for name in files if name not in existing]
+            new_files = [name for name in files if name not in rows]
+            if not new_files:
+                return new_files
+            today = _today_str()
             for name in new_files:
-                rows.append(
-                    self.build_row(
-                        filename=name,
-                        title="",
-                        description="",
-                        is_public=default_public,
-                        date_uploaded=_today_str(),
-                    )
+                rows[name] = self.build_row(
+                    filename=name,
+                    title="",
+                    description="",
+                    is_public=default_public,
+                    date_uploaded=today,
                 )
             self._write_rows(rows)
         return new_files
@@ -181,39 +187,65 @@ class IndexStore:
             return
         with FileLock(str(self.lock_path)):
             rows = self._read_rows()
-            for row in rows:
-                if row.filename in updates:
-                    update = updates[row.filename]
-                    if update.get("title"):
-                        row.title = update["title"]
-                    if update.get("description"):
-                        row.description = update["description"]
-                    row.updated_at = _timestamp()
-            self._write_rows(rows)
+            now = _timestamp()
+            changed = False
+            for filename, update in updates.items():
+                row = rows.get(filename)
+                if not row:
+                    continue
+                if update.get("title"):
+                    row.title = update["title"]
+                if update.get("description"):
+                    row.description = update["description"]
+                row.updated_at = now
+                changed = True
+            if changed:
+                self._write_rows(rows)
+
+    def _index_stamp(self) -> Optional[Tuple[int, int, int]]:
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            return None
+        # Every write swaps in a new inode, so st_ino catches same-tick,
+        # same-size rewrites that mtime and size alone would miss.
+        return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+    def _cached_rows(self) -> Dict[str, IndexRow]:
+        # Writers swap the CSV in atomically, so readers skip the lock and
+        # only re-parse when the file's inode/mtime/size stamp changes.
+        stamp = self._index_stamp()
+        if stamp is None:
+            return {}
+        cache = self._cache
+        if cache is not None and cache[0] == stamp:
+            return cache[1]
+        rows = self._read_rows()
+        self._cache = (stamp, rows)
+        return rows
 
-    def _read_rows(self) -> List[IndexRow]:
+    def _read_rows(self) -> Dict[str, IndexRow]:
         if not self.index_path.exists():
-            return []
+            return {}
         with self.index_path.open("r", newline="", encoding="utf-8") as handle:
             reader = csv.DictReader(handle)
-            rows: List[IndexRow] = []
+            rows: Dict[str, IndexRow] = {}
+            today = _today_str()
             for record in reader:
                 filename = (record.get("filename") or "").strip()
-                if not filename:
+                if not filename or filename in rows:
                     continue
-                rows.append(
-                    IndexRow(
-                        filename=filename,
-                        title=(record.get("title") or "").strip(),
-                        description=(record.get("description") or "").strip(),
-                        is_public=_parse_bool(record.get("is_public"), True),
-                        date_uploaded=(record.get("date_uploaded") or _today_str()).strip(),
-                        updated_at=(record.get("updated_at") or "").strip(),
-                    )
+                rows[filename] = IndexRow(
+                    filename=filename,
+                    title=(record.get("title") or "").strip(),
+                    description=(record.get("description") or "").strip(),
+                    is_public=_parse_bool(record.get("is_public"), True),
+                    date_uploaded=(record.get("date_uploaded") or today).strip(),
+                    updated_at=(record.get("updated_at") or "").strip(),
                 )
         return rows
 
-    def _write_rows(self, rows: List[IndexRow]) -> None:
+    def _write_rows(self, rows: Dict[str, IndexRow]) -> None:
         self.database_dir.mkdir(parents=True, exist_ok=True)
         with tempfile.NamedTemporaryFile(
             "w",
@@ -222,17 +254,19 @@ class IndexStore:
             newline="",
             encoding="utf-8",
         ) as tmp_file:
-            writer = csv.DictWriter(tmp_file, fieldnames=CSV_COLUMNS)
-            writer.writeheader()
-            for row in rows:
-                writer.writerow(
-                    {
-                        "filename": row.filename,
-                        "title": row.title,
-                        "description": row.description,
-                        "is_public": _bool_str(row.is_public),
-                        "date_uploaded": row.date_uploaded,
-                        "updated_at": row.updated_at,
-                    }
+            writer = csv.writer(tmp_file)
+            writer.writerow(CSV_COLUMNS)
+            writer.writerows(
+                (
+                    row.filename,
+                    row.title,
+                    row.description,
+                    _bool_str(row.is_public),
+                    row.date_uploaded,
+                    row.updated_at,
                 )
+                for row in rows.values()
+            )
         os.replace(tmp_file.name, self.index_path)
+        stamp = self._index_stamp()
+        self._cache = (stamp, dict(rows)) if stamp is not None else None
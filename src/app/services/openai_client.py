@@ -1,16 +1,27 @@
-import json
 import re
-from typing import Dict, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
+import orjson
 from loguru import logger
 from openai import OpenAI
 
+_JSON_RE = re.compile(r"\{.*\}", re.DOTALL)
+_TITLE_RE = re.compile(r"title\s*:\s*(.+)", re.IGNORECASE)
+_DESC_RE = re.compile(r"description\s*:\s*(.+)", re.IGNORECASE)
+
 
 class OpenAIService:
-    def __init__(self, api_key: Optional[str], model: str = "gpt-4o-mini") -> None:
+    def __init__(
+        self,
+        api_key: Optional[str],
+        model: str = "gpt-4o-mini",
+        max_retries: int = 5,
+    ) -> None:
         self.api_key = api_key
         self.model = model
-        self.client = OpenAI(api_key=api_key) if api_key else None
+        # The SDK retries 429s, timeouts and 5xx with exponential backoff.
+        self.client = OpenAI(api_key=api_key, max_retries=max_retries) if api_key else None
 
     def generate_metadata(self, prompt: str) -> Optional[Dict[str, str]]:
         if not self.client:
@@ -32,21 +43,35 @@ class OpenAIService:
             logger.warning("OpenAI response did not contain metadata")
         return parsed
 
+    def generate_metadata_batch(
+        self,
+        prompts: List[str],
+        concurrency: int = 8,
+    ) -> List[Optional[Dict[str, str]]]:
+        if not prompts:
+            return []
+        if not self.client:
+            logger.warning("OpenAI API key missing; skipping metadata generation")
+            return [None] * len(prompts)
+
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(prompts))) as executor:
+            return list(executor.map(self.generate_metadata, prompts))
+
 
 def _parse_metadata_output(text: str) -> Optional[Dict[str, str]]:
     json_block = _extract_json(text)
     if json_block:
         try:
-            data = json.loads(json_block)
+            data = orjson.loads(json_block)
             title = str(data.get("title", "")).strip()
             description = str(data.get("description", "")).strip()
             if title or description:
                 return {"title": title, "description": description}
-        except json.JSONDecodeError:
+        except orjson.JSONDecodeError:
             pass
 
-    title_match = re.search(r"title\s*:\s*(.+)", text, re.IGNORECASE)
-    description_match = re.search(r"description\s*:\s*(.+)", text, re.IGNORECASE)
+    title_match = _TITLE_RE.search(text)
+    description_match = _DESC_RE.search(text)
     if title_match or description_match:
         return {
             "title": title_match.group(1).strip() if title_match else "",
@@ -56,5 +81,5 @@ def _parse_metadata_output(text: str) -> Optional[Dict[str, str]]:
 
 
 def _extract_json(text: str) -> Optional[str]:
-    match = re.search(r"\{.*\}", text, re.DOTALL)
+    match = _JSON_RE.search(text)
     return match.group(0) if match else None
@@ -1,10 +1,43 @@
 import re
 from dataclasses import dataclass
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
-from elasticsearch import Elasticsearch
+from elasticsearch import Elasticsearch, helpers
+from elasticsearch.serializer import OrjsonSerializer
 from loguru import logger
 
+_PHRASE_RE = re.compile(r"\"([^\"]+)\"")
+
+INDEX_SETTINGS = {
+    "analysis": {
+        "tokenizer": {
+            "content_ngram": {
+                "type": "ngram",
+                "min_gram": 3,
+                "max_gram": 4,
+                "token_chars": ["letter", "digit"],
+            }
+        },
+        "analyzer": {
+            "content_ngram": {
+                "type": "custom",
+                "tokenizer": "content_ngram",
+                "filter": ["lowercase"],
+            }
+        },
+    }
+}
+INDEX_MAPPINGS = {
+    "properties": {
+        "filename": {"type": "keyword"},
+        "content": {
+            "type": "text",
+            "fields": {"ngram": {"type": "text", "analyzer": "content_ngram"}},
+        },
+        "is_public": {"type": "boolean"},
+    }
+}
+
 
 @dataclass
 class SearchResult:
@@ -28,7 +61,7 @@ class SearchService:
             kwargs = {}
             if username and password:
                 kwargs["basic_auth"] = (username, password)
-            self.client = Elasticsearch(url, **kwargs)
+            self.client = Elasticsearch(url, serializer=OrjsonSerializer(), **kwargs)
 
     def is_enabled(self) -> bool:
         return self.client is not None
@@ -41,19 +74,28 @@ class SearchService:
             if not exists:
                 self.client.indices.create(
                     index=self.index_name,
-                    mappings={
-                        "properties": {
-                            "filename": {"type": "keyword"},
-                            "content": {"type": "text"},
-                            "is_public": {"type": "boolean"},
-                        }
-                    },
+                    settings=INDEX_SETTINGS,
+                    mappings=INDEX_MAPPINGS,
                 )
             self._index_ready = True
         except Exception as exc:  # pragma: no cover - network
             logger.warning(f"Elasticsearch index check failed: {exc}")
 
-    def index_document(self, filename: str, content: str, is_public: bool) -> None:
+    def refresh(self) -> None:
+        if not self.client:
+            return
+        try:
+            self.client.indices.refresh(index=self.index_name)
+        except Exception as exc:  # pragma: no cover - network
+            logger.warning(f"Elasticsearch refresh failed: {exc}")
+
+    def index_document(
+        self,
+        filename: str,
+        content: str,
+        is_public: bool,
+        refresh: Union[bool, str] = False,
+    ) -> None:
         if not self.client:
             return
         self.ensure_index()
@@ -66,21 +108,69 @@ class SearchService:
                     "content": content,
                     "is_public": is_public,
                 },
-                refresh=True,
+                refresh=refresh,
             )
         except Exception as exc:  # pragma: no cover - network
             logger.warning(f"Elasticsearch index failed for {filename}: {exc}")
 
-    def delete_document(self, filename: str) -> None:
+    def bulk_index(self, documents: Iterable[Tuple[str, str, bool]]) -> None:
+        if not self.client:
+            return
+        self.ensure_index()
+        actions = (
+            {
+                "_op_type": "index",
+                "_index": self.index_name,
+                "_id": filename,
+                "_source": {
+                    "filename": filename,
+                    "content": content,
+                    "is_public": is_public,
+                },
+            }
+            for filename, content, is_public in documents
+        )
+        try:
+            failures = [
+                item
+                for ok, item in helpers.parallel_bulk(
+                    self.client,
+                    actions,
+                    thread_count=4,
+                    chunk_size=500,
+                    queue_size=4,
+                    raise_on_error=False,
+                )
+                if not ok
+            ]
+        except Exception as exc:  # pragma: no cover - network
+            logger.warning(f"Elasticsearch bulk index failed: {exc}")
+            return
+        if failures:
+            logger.warning(
+                f"Elasticsearch bulk index failed for {len(failures)} document(s): {failures[0]}"
+            )
+        self.refresh()
+
+    def delete_document(self, filename: str, refresh: Union[bool, str] = False) -> None:
         if not self.client:
             return
         self.ensure_index()
         try:
-            self.client.delete(index=self.index_name, id=filename, ignore=[404], refresh=True)
+            self.client.options(ignore_status=404).delete(
+                index=self.index_name,
+                id=filename,
+                refresh=refresh,
+            )
         except Exception as exc:  # pragma: no cover - network
             logger.warning(f"Elasticsearch delete failed for {filename}: {exc}")
 
-    def update_visibility(self, filename: str, is_public: bool) -> None:
+    def update_visibility(
+        self,
+        filename: str,
+        is_public: bool,
+        refresh: Union[bool, str] = False,
+    ) -> None:
         if not self.client:
             return
         self.ensure_index()
@@ -89,7 +179,7 @@ class SearchService:
                 index=self.index_name,
                 id=filename,
                 doc={"is_public": is_public},
-                refresh=True,
+                refresh=refresh,
             )
         except Exception as exc:  # pragma: no cover - network
             logger.warning(f"Elasticsearch update failed for {filename}: {exc}")
@@ -111,7 +201,10 @@ class SearchService:
         body = {
             "query": {"bool": bool_query},
             "highlight": {
-                "fields": {"content": {"fragment_size": 50, "number_of_fragments": 5}},
+                "fields": {
+                    "content": {"fragment_size": 50, "number_of_fragments": 5},
+                    "content.ngram": {"fragment_size": 50, "number_of_fragments": 5},
+                },
                 "pre_tags": [""],
                 "post_tags": [""],
             },
@@ -129,7 +222,8 @@ class SearchService:
         for hit in hits:
             source = hit.get("_source", {})
             filename = source.get("filename", "")
-            fragments = hit.get("highlight", {}).get("content", [])
+            highlight = hit.get("highlight", {})
+            fragments = highlight.get("content") or highlight.get("content.ngram") or []
             if fragments:
                 for fragment in fragments:
                     results.append(SearchResult(snippet=fragment, filename=filename))
@@ -139,23 +233,28 @@ class SearchService:
 
 
 def _build_query(query: str) -> Dict:
-    phrases = re.findall(r"\"([^\"]+)\"", query)
-    if phrases:
-        phrase = phrases[0].strip()
+    phrase_match = _PHRASE_RE.search(query)
+    if phrase_match:
+        phrase = phrase_match.group(1).strip()
         return {"match_phrase": {"content": phrase}}
 
     terms = query.split()
-    escaped = [f"*{_escape_query_string(term)}*" for term in terms if term]
-    joined = " ".join(escaped)
+    if not terms:
+        return {"match": {"content": {"query": query, "operator": "and"}}}
+    return {"bool": {"must": [_build_term_query(term) for term in terms]}}
+
+
+def _build_term_query(term: str) -> Dict:
+    # content.ngram gives partial-word matches for 3+ character fragments; the
+    # standard-analyzed content clause still matches the whole token, which
+    # covers short words, identifiers such as my_var or os.path whose pieces
+    # are shorter than an ngram, and indexes built before the subfield existed.
     return {
-        "query_string": {
-            "query": joined,
-            "fields": ["content"],
-            "default_operator": "AND",
-            "case_insensitive": True,
+        "bool": {
+            "should": [
+                {"match": {"content.ngram": {"query": term, "operator": "and"}}},
+                {"match": {"content": {"query": term, "operator": "and"}}},
+            ],
+            "minimum_should_match": 1,
         }
     }
-
-
-def _escape_query_string(value: str) -> str:
-    return re.sub(r"([+\-=&|><!(){}\[\]^\"~:/\\])", r"\\\1", value)